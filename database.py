@@ -5,12 +5,13 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
-from typing import Union
+from typing import List, Union
 from pydantic import BaseModel
+import msgspec
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,35 +22,105 @@ db = None
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
+# Connection pool bounds; the app warms min_pool_size connections at startup
+min_pool_size = int(os.getenv("MONGO_MIN_POOL_SIZE", 8))
+max_pool_size = int(os.getenv("MONGO_MAX_POOL_SIZE", 32))
+
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(database_url, minPoolSize=min_pool_size, maxPoolSize=max_pool_size)
     db = _client[database_name]
 
+Document = Union[BaseModel, msgspec.Struct, dict]
+
+def _to_dict(data: Document) -> dict:
+    """Convert a Pydantic model or msgspec struct to a plain dict if needed"""
+    if isinstance(data, BaseModel):
+        return data.model_dump()
+    if isinstance(data, msgspec.Struct):
+        return msgspec.structs.asdict(data)
+    return data.copy()
+
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Document):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
-    # Convert Pydantic model to dict if needed
-    if isinstance(data, BaseModel):
-        data_dict = data.model_dump()
-    else:
-        data_dict = data.copy()
+    data_dict = _to_dict(data)
 
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+async def create_documents(collection_name: str, items: List[Document], ordered: bool = False):
+    """Insert many documents with timestamps in a single round-trip
+
+    Timestamps already set by the caller (e.g. when the document was queued) are kept.
+    """
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    now = datetime.now(timezone.utc)
+    docs = []
+    for data in items:
+        data_dict = _to_dict(data)
+        data_dict.setdefault('created_at', now)
+        data_dict.setdefault('updated_at', now)
+        docs.append(data_dict)
+
+    result = await db[collection_name].insert_many(docs, ordered=ordered)
+    return [str(_id) for _id in result.inserted_ids]
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Get documents from collection, optionally projecting fields server-side"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict or {}, projection)
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=limit)
+
+# $group accumulators whose result does not depend on input order
+_ORDER_INSENSITIVE_ACCUMULATORS = {"$sum", "$avg", "$min", "$max", "$count"}
+
+def _sort_is_useless(next_stage: dict) -> bool:
+    """True if a $sort directly before `next_stage` cannot change the result.
+
+    Only `$count`, or a `$group` whose accumulators are all order-insensitive,
+    qualifies. Anything else ($first/$last/$push, $limit, $facet, $lookup
+    sub-pipelines, ...) keeps the $sort.
+    """
+    if "$count" in next_stage:
+        return True
+    group = next_stage.get("$group")
+    if not isinstance(group, dict):
+        return False
+    for field, accumulator in group.items():
+        if field == "_id":
+            continue
+        if not isinstance(accumulator, dict) or len(accumulator) != 1:
+            return False
+        if next(iter(accumulator)) not in _ORDER_INSENSITIVE_ACCUMULATORS:
+            return False
+    return True
+
+def _strip_useless_sort(pipeline: List[dict]) -> List[dict]:
+    """Drop $sort stages that only feed an order-insensitive $count/$group"""
+    stripped = []
+    for i, stage in enumerate(pipeline):
+        if "$sort" in stage and i + 1 < len(pipeline) and _sort_is_useless(pipeline[i + 1]):
+            continue
+        stripped.append(stage)
+    return stripped
+
+async def aggregate_scalar(collection_name: str, pipeline: List[dict], field: str = "value", default=0):
+    """Run a count/sum style pipeline and return `field` of its single result"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    rows = await db[collection_name].aggregate(_strip_useless_sort(pipeline)).to_list(length=1)
+    return rows[0].get(field, default) if rows else default
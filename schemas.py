@@ -3,14 +3,17 @@ Database Schemas
 
 Define your MongoDB collection schemas here using Pydantic models.
 These schemas are used for data validation in your application.
+Schemas built on a hot path (Ctfsubmission) are msgspec structs instead;
+database.create_document accepts either.
 
-Each Pydantic model represents a collection in your database.
+Each model represents a collection in your database.
 Model name is converted to lowercase for the collection name:
 - User -> "user" collection
 - Product -> "product" collection
 - BlogPost -> "blogs" collection
 """
 
+import msgspec
 from pydantic import BaseModel, Field
 from typing import Optional, Literal
 
@@ -50,16 +53,21 @@ class Ctfchallenge(BaseModel):
     difficulty: DIFFICULTY
     description: str
     hint: Optional[str] = None
-    flag: str = Field(..., description="Exact expected flag value, e.g., FLAG{...}")
+    flag_hash: str = Field(..., description="blake2b hex digest of the expected flag, see main.hash_flag")
     points: int = Field(..., ge=0, description="Score awarded for correct submission")
 
-class Ctfsubmission(BaseModel):
-    """CTF submissions collection (collection name: ctfsubmission)"""
+class Ctfsubmission(msgspec.Struct):
+    """CTF submissions collection (collection name: ctfsubmission)
+
+    A msgspec struct rather than a Pydantic model: one is built per submit.
+    """
     challenge_id: str
     username: str
     submitted_flag: str
     correct: bool = False
     points_awarded: int = 0
+    # True only for the first correct solve per user and challenge
+    scored: bool = False
 
 class Ctfuser(BaseModel):
     """CTF user profile (optional, collection name: ctfuser)"""